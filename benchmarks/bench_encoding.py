@@ -0,0 +1,34 @@
+"""Size and load time of the compact npz geometry encoding compared to OMF files
+
+Run from the repository root: python -m benchmarks.bench_encoding
+"""
+import os
+import tempfile
+import time
+import omf
+from core.core import Project
+from utils.io import load_geometry_npz
+from benchmarks.common import make_session
+
+
+if __name__ == '__main__':
+    for copies in [1, 10, 50]:
+        session, _ = make_session(copies=copies)
+        project = Project(session)
+        with tempfile.TemporaryDirectory() as tmp:
+            omf_file = os.path.join(tmp, 'project.omf')
+            omf.OMFWriter(omf.Project(name=project.name, elements=[bh.geometry for bh in project.boreholes_3d]),
+                          omf_file)
+            start = time.perf_counter()
+            omf.OMFReader(omf_file).get_project()
+            omf_time = time.perf_counter() - start
+            print(f'{len(project.boreholes_3d):5d} boreholes: omf {os.path.getsize(omf_file) / 1024:9.1f} KiB '
+                  f'load {omf_time * 1000:8.1f} ms')
+            for precision in [None, 0.01, 0.001]:
+                npz_file = os.path.join(tmp, 'project.npz')
+                size = project.save_geometry(npz_file, precision=precision)
+                start = time.perf_counter()
+                load_geometry_npz(npz_file)
+                npz_time = time.perf_counter() - start
+                encoding = 'float32' if precision is None else f'{precision:g} m'
+                print(f'{"":16s}npz {encoding:8s} {size / 1024:9.1f} KiB load {npz_time * 1000:8.1f} ms')
@@ -0,0 +1,46 @@
+"""Time to build all 3D boreholes, one by one and with Project.refresh using 1 to N processes
+
+Both sides are timed end to end: striplog intervals, Borehole3D objects and their omf geometry.
+Run from the repository root: python -m benchmarks.bench_geometry
+"""
+import os
+import time
+import numpy as np
+from core.omf import Borehole3D, build_geometries
+from core.core import Project
+from utils.orm import get_interval_list
+from benchmarks.common import make_session
+
+
+def check_sharding(max_processes):
+    """checks that sharded builds equal the single process build on boreholes of very different lengths"""
+
+    counts = [1, 40, 1, 1, 3, 25, 1]
+    names = np.repeat([f'BH{k:d}' for k in range(len(counts))], counts)
+    ids = np.arange(len(names))
+    intervals = {'borehole': names, 'top': ids * 1., 'base': ids + 1., 'x': np.zeros(len(names)),
+                 'y': np.zeros(len(names)), 'top_id': ids, 'base_id': ids + 1}
+    expected = build_geometries(intervals, processes=1)
+    for processes in range(2, max_processes + 1):
+        geometries = build_geometries(intervals, processes=processes)
+        assert list(geometries) == list(expected), processes
+        for name, (vertices, segments) in expected.items():
+            assert np.array_equal(geometries[name][0], vertices) and np.array_equal(geometries[name][1], segments)
+
+
+if __name__ == '__main__':
+    check_sharding(max(os.cpu_count() or 1, 4))
+
+    session, _ = make_session(copies=200)
+    project = Project(session)
+    start = time.perf_counter()
+    for bh in project.boreholes:
+        Borehole3D(intervals=get_interval_list(bh), name=bh.id, legend=project.legend)
+    print(f'{len(project.boreholes):5d} boreholes, one by one: {(time.perf_counter() - start) * 1000:9.1f} ms')
+
+    processes = 1
+    while processes <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        project.refresh(update_3d=True, processes=processes)
+        print(f'{"":16s}refresh, {processes:3d} processes: {(time.perf_counter() - start) * 1000:9.1f} ms')
+        processes *= 2
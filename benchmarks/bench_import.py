@@ -0,0 +1,26 @@
+"""Import time of the package modules and heavy dependencies they load
+
+Each module is imported in a fresh interpreter. Run from the repository root: python -m benchmarks.bench_import
+"""
+import subprocess
+import sys
+
+MODULES = ['core.orm', 'utils.orm', 'utils.io', 'core.omf', 'core.core', 'core.service']
+HEAVY = ['vtk', 'pyvista', 'omfvista', 'IPython', 'matplotlib', 'striplog']
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module:s}
+elapsed = time.perf_counter() - start
+print(elapsed, ' '.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+if __name__ == '__main__':
+    for module in MODULES:
+        timings = []
+        for _ in range(3):
+            output = subprocess.run([sys.executable, '-c', SCRIPT.format(module=module, heavy=HEAVY)],
+                                    stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout.split()
+            timings.append(float(output[0]))
+        print(f'{module:14s} {min(timings) * 1000:8.1f} ms  loads: {" ".join(output[1:]) or "-"}')
@@ -0,0 +1,30 @@
+"""Latency of repeated Project.plot3d calls with the render cache
+
+Run from the repository root: python -m benchmarks.bench_plot3d
+"""
+import time
+import pyvista as pv
+from core.core import Project
+from core.omf import render_cache
+from benchmarks.common import make_session
+
+pv.OFF_SCREEN = True
+
+
+def time_plot3d(project, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        project.plot3d()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+if __name__ == '__main__':
+    for copies in [1, 10]:
+        session, _ = make_session(copies=copies)
+        project = Project(session)
+        render_cache.clear()
+        cold, *warm = time_plot3d(project)
+        print(f'{len(project.boreholes_3d):5d} boreholes: first call {cold * 1000:8.1f} ms, '
+              f'repeated calls {min(warm) * 1000:8.1f} ms, cache {render_cache.memory / 2 ** 20:.1f} MiB')
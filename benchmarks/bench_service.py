@@ -0,0 +1,70 @@
+"""Requests per second served by a ProjectService with N concurrent reader threads, with and without
+concurrent writer threads adding boreholes
+
+Run from the repository root: python -m benchmarks.bench_service
+"""
+import itertools
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core.orm import BoreholeOrm, PositionOrm
+from core.service import ProjectService
+from benchmarks.common import make_engine
+
+DURATION = 5.
+N_WRITERS = 2
+new_ids = itertools.count()
+new_ids_lock = threading.Lock()
+
+
+def new_borehole():
+    """creates a borehole of two intervals with ids that do not collide with the ingested ones"""
+
+    with new_ids_lock:
+        k = next(new_ids)
+    positions = [PositionOrm(upper=z, middle=z, lower=z, x=0., y=0.) for z in (0., 1.5, 4.)]
+    bh = BoreholeOrm(id=f'W{k:d}')
+    bh.intervals_values = {10 ** 6 + 2 * k + j: {'description': d, 'interval_number': j, 'top': positions[j],
+                                                 'base': positions[j + 1]}
+                           for j, d in enumerate(['remblais', 'alluvions'])}
+    return bh
+
+
+def reader(service, deadline, query):
+    requests = 0
+    while time.perf_counter() < deadline:
+        if query:
+            service.select(components=['alluvions'], depth=(2., 6.))
+        else:
+            snapshot = service.snapshot
+            sum(len(bh.intervals) for bh in snapshot.boreholes_3d)
+        requests += 1
+    return requests
+
+
+def writer(service, deadline):
+    requests = 0
+    while time.perf_counter() < deadline:
+        service.add_borehole(new_borehole())
+        requests += 1
+    return requests
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, _ = make_engine(f'sqlite:///{os.path.join(tmp, "project.db"):s}', copies=10)
+        service = ProjectService(engine)
+        for n_writers in [0, N_WRITERS]:
+            for query in [False, True]:
+                kind = 'select' if query else 'snapshot'
+                for n_readers in [1, 2, 4, 8, 16]:
+                    deadline = time.perf_counter() + DURATION
+                    with ThreadPoolExecutor(max_workers=n_readers + n_writers) as pool:
+                        readers = [pool.submit(reader, service, deadline, query) for _ in range(n_readers)]
+                        writers = [pool.submit(writer, service, deadline) for _ in range(n_writers)]
+                        reads = sum(f.result() for f in readers)
+                        writes = sum(f.result() for f in writers)
+                    print(f'{kind:8s} {n_readers:3d} readers, {n_writers:d} writers: {reads / DURATION:10.1f} reads/s '
+                          f'{writes / DURATION:8.1f} writes/s, snapshot version {service.snapshot.version:d}')
@@ -0,0 +1,40 @@
+"""Export time and total bytes of the tiled export compared to the X3D export
+
+Run from the repository root: python -m benchmarks.bench_tiles
+"""
+import os
+import tempfile
+import time
+import pyvista as pv
+from core.core import Project
+from core.omf import render_cache
+from benchmarks.common import make_session
+
+pv.OFF_SCREEN = True
+
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(directory) for f in files)
+
+
+if __name__ == '__main__':
+    for copies in [1, 10, 50]:
+        session, _ = make_session(copies=copies)
+        project = Project(session, name=f'bench_{copies:d}')
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            render_cache.clear()
+            start = time.perf_counter()
+            project.plot3d(x3d=True)
+            x3d_time = time.perf_counter() - start
+            x3d_size = os.path.getsize(f'project_{project.name:s}.x3d')
+            os.chdir(cwd)
+
+            render_cache.clear()
+            start = time.perf_counter()
+            project.export_tiles(os.path.join(tmp, 'tiles'))
+            tiles_time = time.perf_counter() - start
+            tiles_size = directory_size(os.path.join(tmp, 'tiles'))
+        print(f'{len(project.boreholes_3d):5d} boreholes: x3d {x3d_time:7.2f} s {x3d_size / 2 ** 20:8.2f} MiB, '
+              f'tiles (all lods) {tiles_time:7.2f} s {tiles_size / 2 ** 20:8.2f} MiB')
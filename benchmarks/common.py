@@ -0,0 +1,64 @@
+import glob
+import math
+import os
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from core.orm import Base
+from utils.io import boreholes_from_files
+from definitions import ROOT_DIR
+
+SITE_ORIGIN = (152000., 122000.)
+
+
+def make_engine(db_url='sqlite://', copies=1, spacing=25.):
+    """creates an engine on a database filled with the boreholes of the data directory
+
+    Parameters
+    ----------
+    db_url: str
+            url of the database (default='sqlite://' for an in-memory database)
+    copies: int
+            number of copies of each borehole of the data directory, to simulate large sites (default=1)
+    spacing: float
+             boreholes are laid out on a square grid with this spacing around the site origin (default=25.)
+
+    Returns
+    -------
+    engine: sqlalchemy engine
+    components: dict
+                dictionnary containing ID and component
+    """
+
+    files = sorted(glob.glob(os.path.join(ROOT_DIR, 'data', 'boreholes', 'Log_F*.txt')))
+    borehole_dict = {}
+    for c in range(copies):
+        for f in files:
+            name = os.path.basename(f)[4:-4]
+            borehole_dict[name if c == 0 else f'{name:s}_{c:d}'] = f
+    boreholes, components = boreholes_from_files(borehole_dict)
+    n_cols = int(math.ceil(math.sqrt(len(boreholes))))
+    for k, bh in enumerate(boreholes):
+        x, y = SITE_ORIGIN[0] + spacing * (k % n_cols), SITE_ORIGIN[1] + spacing * (k // n_cols)
+        for interval in bh.intervals.values():
+            for pos in (interval.top, interval.base):
+                pos.x, pos.y = x, y
+
+    engine = create_engine(db_url)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all(boreholes)
+    session.commit()
+    session.close()
+    return engine, components
+
+
+def make_session(db_url='sqlite://', copies=1, spacing=25.):
+    """creates a session on a database filled with the boreholes of the data directory
+
+    See Also
+    --------
+    make_engine: description of the parameters
+    """
+
+    engine, components = make_engine(db_url, copies=copies, spacing=spacing)
+    return sessionmaker(bind=engine)(), components
@@ -1,9 +1,9 @@
 from core.orm import BoreholeOrm, ComponentOrm
-from core.omf import Borehole3D
-from utils.orm import get_interval_list
-from vtk import vtkX3DExporter
-from IPython.display import HTML
-import pyvista as pv
+from core.tiles import export_tiles
+from core.section import borehole_arrays, cross_section, cross_sections, get_surface_points
+from utils.io import save_geometry_npz
+from utils.orm import get_interval_list, select_intervals, get_selection_interval_list, select_boreholes_in_box
+import numpy as np
 
 
 class Project:
@@ -20,11 +20,17 @@ class Project:
 
     Methods
     --------
-    refresh(update_3d=false)
+    refresh(update_3d=false, processes=1)
     add_borehole(self, bh)
     commit()
     add_components(self, components)
-    plot3d(self, x3d=False)
+    select(self, components=None, depth=None, boreholes=None, as_3d=False)
+    plot3d(self, x3d=False, radius=3)
+    export_tiles(self, directory, tile_size=100., lods=(20, 8, 3), radius=3)
+    save_geometry(self, filename, origin=None, precision=None)
+    get_boreholes_near(self, polylines, buffer)
+    cross_section(self, polyline, buffer, surface=None)
+    cross_sections(self, polylines, buffer, surface=None, processes=None)
         
     """
     
@@ -47,7 +53,7 @@ class Project:
         self.legend = legend
         self.refresh(update_3d=True)
 
-    def refresh(self, update_3d=False):
+    def refresh(self, update_3d=False, processes=1):
         """
         read Boreholes in the database and updates 3D boreholes
         
@@ -55,15 +61,30 @@ class Project:
         -----------
         update_3d : bool
             if True, updates Striplog/OMF 3D boreholes (default=True)
+        processes : int
+            number of worker processes used to build the geometry of the 3D boreholes,
+            None for the number of processors (default=1)
+            
+        See Also
+        ---------
+        build_geometries : builds the geometry of all boreholes in a single vectorized pass
         """
         
         self.boreholes = self.session.query(BoreholeOrm).all()
         if update_3d:
+            from core.omf import Borehole3D, build_geometries
+
+            geometries = build_geometries(select_intervals(self.session), processes=processes)
             self.boreholes_3d = []
             for bh in self.boreholes:
                 list_of_intervals = get_interval_list(bh)
-                print(list_of_intervals)
-                self.boreholes_3d.append(Borehole3D(intervals=list_of_intervals, legend=self.legend))
+                geometry = geometries.get(bh.id)
+                # boreholes whose intervals are not all in the batch (e.g. missing positions) are built one by one
+                build = geometry is None or len(geometry[1]) != len(list_of_intervals)
+                bh_3d = Borehole3D(intervals=list_of_intervals, name=bh.id, legend=self.legend, build=build)
+                if not build:
+                    bh_3d.set_geometry(*geometry)
+                self.boreholes_3d.append(bh_3d)
 
     def commit(self):
         'Validate all modifications done in the project'
@@ -84,11 +105,13 @@ class Project:
         Borehole3D : Striplog/OMF borehole object
         """
         
+        from core.omf import Borehole3D
+
         self.session.add(bh)
         self.commit()
         self.refresh()
         list_of_intervals = get_interval_list(bh)
-        self.boreholes_3d.append(Borehole3D(intervals=list_of_intervals, legend=self.legend))
+        self.boreholes_3d.append(Borehole3D(intervals=list_of_intervals, name=bh.id, legend=self.legend))
 
     def add_components(self, components):
         """
@@ -110,7 +133,40 @@ class Project:
         self.commit()
         self.refresh()
 
-    def plot3d(self, x3d=False):
+    def select(self, components=None, depth=None, boreholes=None, as_3d=False):
+        """
+        Select intervals in the database without loading the whole project
+        
+        Parameters
+        -----------
+        components : list
+            list of component names to keep, e.g. ['alluvions'] (default=None for all components)
+        depth : tuple
+            (top, base) depth range, selected intervals are clipped to it (default=None for all depths)
+        boreholes : list
+            list of borehole ids to keep (default=None for all boreholes)
+        as_3d : bool
+            if True, returns a list of Borehole3D objects built from the selected intervals
+            instead of columnar arrays (default=False)
+            
+        Returns
+        --------
+        dict of numpy arrays or list of Borehole3D objects
+        
+        See Also
+        ---------
+        select_intervals : builds and runs the SQL query
+        """
+        
+        selection = select_intervals(self.session, components=components, depth=depth, boreholes=boreholes)
+        if not as_3d:
+            return selection
+        from core.omf import Borehole3D
+
+        return [Borehole3D(intervals=intervals, name=bh_id, legend=self.legend)
+                for bh_id, intervals in get_selection_interval_list(selection).items()]
+
+    def plot3d(self, x3d=False, radius=3):
         """
         Returns an interactive 3D representation of all boreholes in the project
         
@@ -118,10 +174,20 @@ class Project:
         -----------
         x3d : bool
             if True, generates a 3xd file of the 3D (default=False)
+        radius : float
+            radius of the borehole tubes (default=3)
+            
+        See Also
+        ---------
+        render_cache : tubes of unchanged boreholes are reused between calls
         """
+        import pyvista as pv
+        from vtk import vtkX3DExporter
+        from IPython.display import HTML
+
         pl = pv.Plotter()
         for bh in self.boreholes_3d:
-            bh.plot3d(plotter=pl)
+            bh.plot3d(plotter=pl, radius=radius)
         if not x3d:
             pl.show()
         else:
@@ -141,4 +207,133 @@ class Project:
                        '<viewpoint position="-1.94639 1.79771 -2.89271" orientation="0.03886 0.99185 0.12133 3.75685">' \
                        '</viewpoint>\n <Inline nameSpaceName="Borehole" mapDEFToID="true" url="' + filename + '" />\n' \
                        '</scene>\n</x3d>\n</body>\n</html>\n'
-            return HTML(x3d_html)
\ No newline at end of file
+            return HTML(x3d_html)
+
+    def export_tiles(self, directory, tile_size=100., lods=(20, 8, 3), radius=3):
+        """
+        Exports the boreholes of the project as spatial tiles for web viewers
+        
+        Parameters
+        -----------
+        directory : str
+            output directory, it receives a manifest.json file, binary tiles and an index.html viewer
+        tile_size : float
+            size of the square tiles in the horizontal plane (default=100.)
+        lods : tuple
+            number of sides of the tubes for each level of detail, from finest to coarsest (default=(20, 8, 3))
+        radius : float
+            radius of the borehole tubes (default=3)
+            
+        Returns
+        --------
+        dict
+            content of the manifest
+            
+        See Also
+        ---------
+        export_tiles : tiles layout and binary format
+        """
+        
+        return export_tiles(self.boreholes_3d, directory, tile_size=tile_size, lods=lods, radius=radius)
+
+    def save_geometry(self, filename, origin=None, precision=None):
+        """
+        Saves the geometry of the boreholes of the project in a compressed and compact npz file
+        
+        Parameters
+        -----------
+        filename : str
+            name of the npz file
+        origin : tuple
+            (x, y, z) site origin subtracted from the vertices (default=None, computed from the vertices)
+        precision : float
+            if given, vertices are quantized with this step in meters, otherwise stored as float32 (default=None)
+            
+        Returns
+        --------
+        int
+            size of the file in bytes
+            
+        See Also
+        ---------
+        load_geometry_npz : reads the file back
+        """
+        
+        return save_geometry_npz(self.boreholes_3d, filename, origin=origin, precision=precision)
+
+    def get_boreholes_near(self, polylines, buffer):
+        """
+        Returns the Borehole3D objects located in the bounding box of polylines enlarged by buffer
+        
+        Parameters
+        -----------
+        polylines : list
+            list of (m, 2) arrays of horizontal coordinates of the polylines vertices
+        buffer : float
+            enlargement of the bounding box
+            
+        Returns
+        --------
+        list of Borehole3D objects
+        """
+        
+        points = np.vstack([np.asarray(p, dtype=float).reshape(-1, 2) for p in polylines])
+        (x_min, y_min), (x_max, y_max) = points.min(axis=0) - buffer, points.max(axis=0) + buffer
+        ids = set(select_boreholes_in_box(self.session, x_min, x_max, y_min, y_max))
+        return [bh for bh in self.boreholes_3d if bh.name in ids]
+
+    def cross_section(self, polyline, buffer, surface=None, n_samples=200):
+        """
+        Returns a vertical section along a polyline through the boreholes located within buffer of it
+        
+        Parameters
+        -----------
+        polyline : array
+            (m, 2) horizontal coordinates of the polyline vertices
+        buffer : float
+            maximum horizontal distance between a borehole and the polyline
+        surface : str, pyvista mesh or array
+            ground surface on which the collars are set and that clips the intervals, e.g. data/ground_surface.vtk
+            (default=None)
+        n_samples : int
+            number of samples of the surface profile along the section (default=200)
+            
+        Returns
+        --------
+        dict
+            surface profile and columnar arrays of the projected intervals
+            
+        See Also
+        ---------
+        cross_section : description of the returned section
+        section_to_mesh : builds a mesh of the section
+        """
+        
+        intervals = borehole_arrays(self.get_boreholes_near([polyline], buffer))
+        surface_points = None if surface is None else get_surface_points(surface)
+        return cross_section(intervals, polyline, buffer, surface_points=surface_points, n_samples=n_samples)
+
+    def cross_sections(self, polylines, buffer, surface=None, n_samples=200, processes=None):
+        """
+        Returns vertical sections along many polylines, computed in batch with a process pool
+        
+        Parameters
+        -----------
+        polylines : list
+            list of (m, 2) arrays of horizontal coordinates of the polylines vertices
+        processes : int
+            number of worker processes (default=None for the number of processors)
+            
+        Returns
+        --------
+        list of sections
+            
+        See Also
+        ---------
+        Project.cross_section : description of the other parameters
+        """
+        
+        intervals = borehole_arrays(self.get_boreholes_near(polylines, buffer))
+        surface_points = None if surface is None else get_surface_points(surface)
+        return cross_sections(intervals, polylines, buffer, surface_points=surface_points, n_samples=n_samples,
+                              processes=processes)
@@ -1,14 +1,88 @@
 from striplog import Lexicon, Striplog, Legend
 from striplog.utils import hex_to_rgb
 from matplotlib.colors import ListedColormap
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import os
+import threading
+import uuid
 import numpy as np
-import omfvista as ov
-import pyvista as pv
 import omf
-from vtk import vtkX3DExporter
-from IPython.display import HTML
 from definitions import ROOT_DIR
 
+
+class RenderCache:
+    """
+    Least recently used cache of render artifacts (vtk meshes) bounded by memory, safe to use from several threads
+    
+    Attributes
+    -----------
+    max_memory : int
+        maximum memory used by the cached meshes in bytes
+    memory : int
+        memory currently used by the cached meshes in bytes
+
+    Methods
+    --------
+    get(key)
+    put(key, mesh)
+    clear()
+    """
+
+    def __init__(self, max_memory=256 * 2 ** 20):
+        """
+        RenderCache class
+        
+        Parameters
+        -----------
+        max_memory : int
+            maximum memory used by the cached meshes in bytes (default = 256 MiB)
+        """
+        
+        self.max_memory = max_memory
+        self.memory = 0
+        self._meshes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._meshes)
+
+    def get(self, key):
+        """
+        Returns the cached mesh for key or None if it is not cached
+        """
+        
+        with self._lock:
+            if key not in self._meshes:
+                return None
+            self._meshes.move_to_end(key)
+            return self._meshes[key][0]
+
+    def put(self, key, mesh):
+        """
+        Caches mesh for key and evicts the least recently used meshes if max_memory is exceeded
+        """
+        
+        size = mesh.actual_memory_size * 1024  # actual_memory_size is given in kibibytes
+        with self._lock:
+            if key in self._meshes:
+                self.memory -= self._meshes.pop(key)[1]
+            self._meshes[key] = (mesh, size)
+            self.memory += size
+            while self.memory > self.max_memory and len(self._meshes) > 1:
+                _, (_, evicted_size) = self._meshes.popitem(last=False)
+                self.memory -= evicted_size
+
+    def clear(self):
+        'Remove all cached meshes'
+        with self._lock:
+            self._meshes.clear()
+            self.memory = 0
+
+
+render_cache = RenderCache()
+
+
 def striplog_legend_to_omf_legend(legend):
     """
     Creates an omf.data.Legend object from a striplog.Legend object
@@ -36,6 +110,80 @@ def striplog_legend_to_omf_legend(legend):
     return omf.data.Legend(description='', name='', values=omf.data.ColorArray(omf_legend)), ListedColormap(new_colors)
 
 
+def _build_geometry_arrays(borehole, top, base, x, y, top_id, base_id):
+    # one vertex per base and one per top that is not the base of the previous interval of the same borehole
+    n = len(top)
+    first = np.ones(n, dtype=bool)
+    first[1:] = borehole[1:] != borehole[:-1]
+    new_top = first.copy()
+    new_top[1:] |= top_id[1:] != base_id[:-1]
+    base_index = np.cumsum(new_top + 1) - 1
+    top_index = base_index - 1
+    vertices = np.empty((base_index[-1] + 1 if n > 0 else 0, 3))
+    vertices[base_index] = np.column_stack([x, y, -base])
+    vertices[top_index[new_top]] = np.column_stack([x, y, -top])[new_top]
+    starts = np.flatnonzero(first)
+    segment_offsets = np.append(starts, n)
+    vertex_offsets = np.append(top_index[starts], len(vertices))
+    # segments are indexed locally in the vertices of their borehole
+    segments = np.column_stack([top_index, base_index]) - \
+        np.repeat(vertex_offsets[:-1], np.diff(segment_offsets))[:, None]
+    return borehole[starts], vertices, segments, vertex_offsets, segment_offsets
+
+
+def _build_geometry_arrays_chunk(args):
+    return _build_geometry_arrays(*args)
+
+
+def build_geometries(intervals, processes=1):
+    """
+    Computes vertices and segments of all boreholes in a single vectorized pass
+    
+    Parameters
+    -----------
+    intervals : dict
+        columnar arrays of intervals with keys 'borehole', 'top', 'base', 'x', 'y', 'top_id' and 'base_id',
+        ordered by borehole and interval number, as returned by select_intervals
+        
+    processes : int
+        number of worker processes sharing the boreholes, None for the number of processors (default=1)
+        
+    Returns
+    --------
+    dict
+        (vertices, segments) arrays with borehole ids as keys, they are views into arrays shared by all boreholes
+        
+    See Also
+    ---------
+    Borehole3D.set_geometry : sets the geometry of a borehole from these arrays
+    """
+
+    columns = [np.asarray(intervals[k]) for k in ['borehole', 'top', 'base', 'x', 'y', 'top_id', 'base_id']]
+    n_chunks = min(len(columns[0]), processes or os.cpu_count() or 1)
+    if n_chunks <= 1:
+        results = [_build_geometry_arrays(*columns)]
+    else:
+        # split the intervals in chunks of about the same size, at borehole boundaries
+        n = len(columns[0])
+        starts = np.flatnonzero(np.append(True, columns[0][1:] != columns[0][:-1]))
+        # first borehole starting after each target, the last borehole when a target falls inside it
+        nearest = np.minimum(np.searchsorted(starts, np.linspace(0, n, n_chunks + 1)[1:-1]), len(starts) - 1)
+        bounds = np.unique(np.hstack([0, starts[nearest], n]))
+        chunks = [[c[a:b] for c in columns] for a, b in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(max_workers=n_chunks) as pool:
+            results = list(pool.map(_build_geometry_arrays_chunk, chunks))
+
+    names = np.hstack([r[0] for r in results])
+    vertices = np.vstack([r[1] for r in results])
+    segments = np.vstack([r[2] for r in results])
+    vertex_shifts = np.cumsum([0] + [len(r[1]) for r in results[:-1]])
+    segment_shifts = np.cumsum([0] + [len(r[2]) for r in results[:-1]])
+    vertex_offsets = np.hstack([0] + [r[3][1:] + shift for r, shift in zip(results, vertex_shifts)])
+    segment_offsets = np.hstack([0] + [r[4][1:] + shift for r, shift in zip(results, segment_shifts)])
+    return {str(name): (vertices[vertex_offsets[k]:vertex_offsets[k + 1]],
+                        segments[segment_offsets[k]:segment_offsets[k + 1]]) for k, name in enumerate(names)}
+
+
 class Borehole3D(Striplog):
     """
     Borehole object based on striplog object that can be displayed in a 3D environment
@@ -50,18 +198,24 @@ class Borehole3D(Striplog):
     omf_cmap : list of matplotlib colormap
     x_collar : float
     y_collar : float
+    uid : str
+    geometry_version : int
 
     Methods
     --------
     get_components_indices()
+    get_legend_indices()
     build_geometry()
+    set_geometry(vertices, segments)
+    get_tube(radius=3, n_sides=20)
     commit()
     add_components(components)
     plot3d(x3d=False)
 
     """
 
-    def __init__(self, intervals=None, components=None, name='', legend=None, x_collar=0., y_collar=0.):
+    def __init__(self, intervals=None, components=None, name='', legend=None, x_collar=0., y_collar=0.,
+                 build=True):
         
         """
         build a Borehole3D object from Striplog.Intervals list
@@ -83,6 +237,9 @@ class Borehole3D(Striplog):
             
         y_collar : float
             Y coordinate of the borehole (default = 0)
+            
+        build : bool
+            if False, the geometry is not built and must be given with set_geometry (default = True)
         """
         
         self.name = name
@@ -109,9 +266,11 @@ class Borehole3D(Striplog):
         # instantiation with supers properties
         Striplog.__init__(self, list_of_Intervals=self.intervals)
 
-        # self.uid=uuid #get a unique for identification of borehole in the project
+        self.uid = uuid.uuid4().hex  # unique identification of the borehole in the render cache
+        self.geometry_version = 0
 
-        self.build_geometry()
+        if build:
+            self.build_geometry()
 
     def get_components_indices(self):
         """
@@ -130,6 +289,23 @@ class Borehole3D(Striplog):
                 indices.append(-1)
         return np.array(indices)
 
+    def get_legend_indices(self):
+        """
+        retrieve the index in the legend of the main component of each interval, so that the same
+        lithology gets the same index in all boreholes
+        
+        Returns
+        --------
+        array of indices, -1 for components that are not in the legend
+        """
+        
+        decors = list(self.legend)
+        indices = []
+        for i in self.intervals:
+            decor = self.legend.get_decor(i.primary) if i.primary is not None else None
+            indices.append(next((k for k, d in enumerate(decors) if d is decor), -1))
+        return np.array(indices, dtype=int)
+
     def build_geometry(self):
         """
         build an omf.LineSetElement geometry of the borehole
@@ -141,34 +317,46 @@ class Borehole3D(Striplog):
         """
 
         vertices, segments = [], []
+        contacts = {}  # vertex index of each Position object, intervals sharing a contact share its vertex
 
         for i in self.intervals:
-            if i.top not in vertices:
-                if hasattr(i.top, 'x') and hasattr(i.top, 'y'):
-                    x = i.top.x
-                    y = i.top.y
-                else:
-                    x = self.x_collar
-                    y = self.y_collar
-                vertices.append([x, y, -i.top.z])
-                top = len(vertices) - 1
-            else:
-                top = vertices.index(i.top)
-            if i.base not in vertices:
-                if hasattr(i.base, 'x') and hasattr(i.base, 'y'):
-                    x = i.base.x
-                    y = i.base.y
-                else:
-                    x = self.x_collar
-                    y = self.y_collar
-                vertices.append([x, y, -i.base.z])
-                base = len(vertices) - 1
-            else:
-                base = vertices.index(i.base)
+            ends = []
+            for pos in (i.top, i.base):
+                if id(pos) not in contacts:
+                    if getattr(pos, 'x', None) is not None and getattr(pos, 'y', None) is not None:
+                        x = pos.x
+                        y = pos.y
+                    else:
+                        x = self.x_collar
+                        y = self.y_collar
+                    contacts[id(pos)] = len(vertices)
+                    vertices.append([x, y, -pos.z])
+                ends.append(contacts[id(pos)])
+            segments.append(ends)
+
+        self.set_geometry(np.array(vertices), np.array(segments, dtype=int).reshape(-1, 2))
 
-            segments.append([top, base])
+        print("Borehole geometry created successfully !")
 
-        vertices = np.array(vertices)
+        return self.geometry
+
+    def set_geometry(self, vertices, segments):
+        """
+        set the omf.LineSetElement geometry of the borehole from arrays computed elsewhere, e.g. by build_geometries
+        
+        Parameters
+        -----------
+        vertices : numpy array
+            (n, 3) coordinates of the vertices
+            
+        segments : numpy array
+            (m, 2) indices of the top and base vertices of each interval
+            
+        Returns
+        --------
+        geometry : omf.lineset.LineSetGeometry
+            Contains spatial information of a line set
+        """
 
         self.geometry = omf.LineSetElement(name=self.name,
                                            geometry=omf.LineSetGeometry(
@@ -178,14 +366,46 @@ class Borehole3D(Striplog):
                                                                 description='test',
                                                                 array=omf.ScalarArray(self.get_components_indices()),
                                                                 legends=[self.omf_legend],
+                                                                location='segments'),
+                                                 omf.MappedData(name='lithology',
+                                                                description='index in the legend',
+                                                                array=omf.ScalarArray(self.get_legend_indices()),
+                                                                legends=[self.omf_legend],
                                                                 location='segments')]
                                            )
-
-        print("Borehole geometry created successfully !")
+        self.geometry_version += 1
 
         return self.geometry
 
-    def plot3d(self, plotter=None, x3d=False):
+    def get_tube(self, radius=3, n_sides=20):
+        """
+        Returns the tube mesh of the borehole, from the render cache if the geometry did not change
+        
+        Parameters
+        -----------
+        radius : float
+            radius of the tube (default=3)
+            
+        n_sides : int
+            number of sides of the tube, lower values give coarser meshes (default=20)
+            
+        Returns
+        --------
+        pyvista.PolyData
+        """
+        
+        key = (self.uid, self.geometry_version, radius, n_sides)
+        tube = render_cache.get(key)
+        if tube is None:
+            import omfvista as ov
+            seg = ov.line_set_to_vtk(self.geometry)
+            seg.set_active_scalars('component')
+            ov.lineset.add_data(seg, self.geometry.data)
+            tube = seg.tube(radius=radius, n_sides=n_sides)
+            render_cache.put(key, tube)
+        return tube
+
+    def plot3d(self, plotter=None, x3d=False, radius=3):
         """
         Returns an interactive 3D representation of all boreholes in the project
         
@@ -196,23 +416,27 @@ class Borehole3D(Striplog):
             
         x3d : bool
             if True, generates a 3xd file of the 3D (default=False)
+            
+        radius : float
+            radius of the borehole tube (default=3)
         """
-        
-        omf_legend, _ = striplog_legend_to_omf_legend(self.legend)
+
+        import pyvista as pv
+        from vtk import vtkX3DExporter
+        from IPython.display import HTML
 
         if plotter is None:
             plotter = pv.Plotter()
             show = True
         else:
             show = False
-            
-        seg = ov.line_set_to_vtk(self.geometry)
-        seg.set_active_scalars('component')
-        ov.lineset.add_data(seg, self.geometry.data)
-        plotter.add_mesh(seg.tube(radius=3), cmap=self.omf_cmap)
+
+        # the colormap is applied by the plotter so that cached tubes do not depend on it
+        plotter.add_mesh(self.get_tube(radius=radius), cmap=self.omf_cmap)
         
-        if show and not x3d:
-            plotter.show()
+        if not x3d:
+            if show:
+                plotter.show()
         else:
             writer = vtkX3DExporter()
             writer.SetInput(plotter.renderer.GetRenderWindow())
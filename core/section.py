@@ -0,0 +1,272 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+
+
+def get_surface_points(surface):
+    """
+    Returns the (n, 3) points of a ground surface
+
+    Parameters
+    -----------
+    surface : str, pyvista mesh or array
+        file name of a mesh readable by pyvista (e.g. data/ground_surface.vtk), mesh or array of points
+
+    Returns
+    --------
+    numpy array
+    """
+
+    if isinstance(surface, str):
+        import pyvista as pv
+        surface = pv.read(surface)
+    if hasattr(surface, 'points'):
+        surface = surface.points
+    return np.asarray(surface, dtype=float).reshape(-1, 3)
+
+
+def surface_interpolator(surface_points):
+    """
+    Returns a linear interpolator of the ground surface elevation
+
+    Parameters
+    -----------
+    surface_points : numpy array
+        (n, 3) points of the ground surface
+
+    Returns
+    --------
+    scipy.interpolate.LinearNDInterpolator
+        callable returning the elevation at (k, 2) horizontal coordinates, NaN outside the surface
+    """
+
+    from scipy.interpolate import LinearNDInterpolator
+
+    # the Delaunay triangulation of the surface is computed here, build it once for many sections
+    return LinearNDInterpolator(surface_points[:, :2], surface_points[:, 2])
+
+
+def borehole_arrays(boreholes_3d):
+    """
+    Gathers the intervals of Borehole3D objects in columnar arrays, one item per interval
+
+    Parameters
+    -----------
+    boreholes_3d : list
+        list of Borehole3D objects
+
+    Returns
+    --------
+    dict
+        dictionary of numpy arrays with keys 'borehole', 'description', 'lithology', 'x', 'y', 'top' and 'base',
+        lithology is the index of the interval in the legend (-1 if missing) and top and base are the
+        z coordinates of the interval relative to the collar
+    """
+
+    columns = {'borehole': [], 'description': [], 'lithology': [], 'x': [], 'y': [], 'top': [], 'base': []}
+    for bh in boreholes_3d:
+        vertices = np.asarray(bh.geometry.geometry.vertices.array, dtype=float).reshape(-1, 3)
+        segments = np.asarray(bh.geometry.geometry.segments.array).reshape(-1, 2)
+        columns['borehole'].append(np.full(len(segments), bh.name, dtype=object))
+        columns['description'].append(np.array([i.description for i in bh.intervals], dtype=object))
+        columns['lithology'].append(bh.get_legend_indices())
+        columns['x'].append(vertices[segments[:, 0], 0])
+        columns['y'].append(vertices[segments[:, 0], 1])
+        columns['top'].append(vertices[segments[:, 0], 2])
+        columns['base'].append(vertices[segments[:, 1], 2])
+    arrays = {k: np.hstack(v) if len(v) > 0 else np.zeros(0) for k, v in columns.items()}
+    arrays['borehole'] = arrays['borehole'].astype(str)
+    arrays['description'] = arrays['description'].astype(str)
+    arrays['lithology'] = arrays['lithology'].astype(int)
+    return arrays
+
+
+def polyline_projection(points, polyline):
+    """
+    Projects points on a polyline
+
+    Parameters
+    -----------
+    points : numpy array
+        (n, 2) horizontal coordinates of the points
+
+    polyline : numpy array
+        (m, 2) horizontal coordinates of the polyline vertices
+
+    Returns
+    --------
+    chainage : numpy array
+        distance along the polyline of the projection of each point
+    distance : numpy array
+        distance between each point and the polyline
+    """
+
+    points = np.asarray(points, dtype=float).reshape(-1, 1, 2)
+    polyline = np.asarray(polyline, dtype=float).reshape(-1, 2)
+    starts, directions = polyline[:-1], np.diff(polyline, axis=0)
+    lengths = np.hypot(directions[:, 0], directions[:, 1])
+    t = np.clip(((points - starts) * directions).sum(axis=2) / np.maximum(lengths ** 2, 1e-12), 0., 1.)
+    distances = np.linalg.norm(points - (starts + t[:, :, None] * directions), axis=2)
+    nearest = np.argmin(distances, axis=1)
+    rows = np.arange(len(nearest))
+    chainage = np.hstack([0., np.cumsum(lengths)])[nearest] + t[rows, nearest] * lengths[nearest]
+    return chainage, distances[rows, nearest]
+
+
+def cross_section(intervals, polyline, buffer, surface_points=None, n_samples=200, elevation=None):
+    """
+    Builds a vertical section along a polyline from intervals of boreholes located within buffer of it
+
+    Parameters
+    -----------
+    intervals : dict
+        columnar arrays of intervals as returned by borehole_arrays
+
+    polyline : numpy array
+        (m, 2) horizontal coordinates of the polyline vertices
+
+    buffer : float
+        maximum horizontal distance between a borehole and the polyline
+
+    surface_points : numpy array
+        (n, 3) points of the ground surface, boreholes collars are set on it and intervals are clipped
+        by its profile along the section, intervals of boreholes outside of the surface are dropped
+        (default=None, collars at elevation 0 and no clipping)
+
+    n_samples : int
+        number of samples of the surface profile along the section (default=200)
+
+    elevation : scipy.interpolate.LinearNDInterpolator
+        interpolator of the ground surface as returned by surface_interpolator, used instead of
+        surface_points to avoid triangulating the surface again (default=None)
+
+    Returns
+    --------
+    dict
+        'profile' : (n_samples, 2) array of chainage and surface elevation (NaN outside the surface),
+        'intervals' : columnar arrays of the selected intervals with keys 'borehole', 'description', 'lithology',
+        'chainage', 'distance', 'top' and 'base', where top and base are elevations,
+        'outside_surface' : names of the boreholes within buffer dropped because their collar is outside
+        of the surface
+    """
+
+    polyline = np.asarray(polyline, dtype=float).reshape(-1, 2)
+    lengths = np.hypot(*np.diff(polyline, axis=0).T)
+    cumulative = np.hstack([0., np.cumsum(lengths)])
+    chainage_samples = np.linspace(0., cumulative[-1], n_samples)
+
+    xy = np.column_stack([intervals['x'], intervals['y']])
+    chainage, distance = polyline_projection(xy, polyline)
+    keep = distance <= buffer
+    xy, chainage, distance = xy[keep], chainage[keep], distance[keep]
+    top, base = intervals['top'][keep], intervals['base'][keep]
+
+    if elevation is None and surface_points is not None:
+        elevation = surface_interpolator(surface_points)
+    if elevation is None:
+        profile = np.full(n_samples, np.nan)
+        outside = np.zeros(0, dtype=intervals['borehole'].dtype)
+    else:
+        samples_xy = np.column_stack([np.interp(chainage_samples, cumulative, polyline[:, 0]),
+                                      np.interp(chainage_samples, cumulative, polyline[:, 1])])
+        profile = elevation(samples_xy)
+        collar = elevation(xy)
+        outside = np.unique(intervals['borehole'][keep][np.isnan(collar)])
+        # fmin ignores the NaN of the profile outside of the surface
+        surface = np.interp(chainage, chainage_samples, profile)
+        top, base = np.fmin(collar + top, surface), np.fmin(collar + base, surface)
+        # intervals without a collar elevation are not selected below
+        top[np.isnan(collar)] = np.nan
+
+    selected = top > base
+    section_intervals = {'borehole': intervals['borehole'][keep][selected],
+                         'description': intervals['description'][keep][selected],
+                         'lithology': intervals['lithology'][keep][selected],
+                         'chainage': chainage[selected], 'distance': distance[selected],
+                         'top': top[selected], 'base': base[selected]}
+    return {'profile': np.column_stack([chainage_samples, profile]), 'intervals': section_intervals,
+            'outside_surface': outside}
+
+
+def _cross_sections_chunk(args):
+    intervals, polylines, buffer, surface_points, n_samples = args
+    elevation = None if surface_points is None else surface_interpolator(surface_points)
+    return [cross_section(intervals, p, buffer, n_samples=n_samples, elevation=elevation) for p in polylines]
+
+
+def cross_sections(intervals, polylines, buffer, surface_points=None, n_samples=200, processes=None):
+    """
+    Builds many vertical sections in batch with a process pool
+
+    Parameters
+    -----------
+    intervals : dict
+        columnar arrays of intervals as returned by borehole_arrays
+
+    polylines : list
+        list of (m, 2) arrays of horizontal coordinates of the polylines vertices
+
+    processes : int
+        number of worker processes, 1 computes the sections in the current process
+        (default=None for the number of processors)
+
+    Returns
+    --------
+    list
+        list of sections as returned by cross_section
+
+    See Also
+    ---------
+    cross_section : description of the other parameters
+    """
+
+    if processes == 1 or len(polylines) <= 1:
+        return _cross_sections_chunk((intervals, polylines, buffer, surface_points, n_samples))
+    n_chunks = min(len(polylines), processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=n_chunks) as pool:
+        chunks = [polylines[k::n_chunks] for k in range(n_chunks)]
+        results = list(pool.map(_cross_sections_chunk,
+                                [(intervals, c, buffer, surface_points, n_samples) for c in chunks]))
+    # chunks interleave the polylines, restore their order
+    sections = [None] * len(polylines)
+    for k, chunk in enumerate(results):
+        sections[k::n_chunks] = chunk
+    return sections
+
+
+def section_to_mesh(section, width=1.):
+    """
+    Returns a mesh of a section in the (chainage, 0, elevation) plane
+
+    Parameters
+    -----------
+    section : dict
+        section as returned by cross_section
+
+    width : float
+        width of the intervals rectangles along the section (default=1.)
+
+    Returns
+    --------
+    pyvista.MultiBlock
+        'intervals' : one quad per interval with a 'lithology' cell array,
+        'surface' : polyline of the ground surface profile
+    """
+
+    import pyvista as pv
+
+    intervals = section['intervals']
+    s, top, base = intervals['chainage'], intervals['top'], intervals['base']
+    n = len(s)
+    points = np.stack([np.column_stack([s - width / 2, np.zeros(n), base]),
+                       np.column_stack([s + width / 2, np.zeros(n), base]),
+                       np.column_stack([s + width / 2, np.zeros(n), top]),
+                       np.column_stack([s - width / 2, np.zeros(n), top])], axis=1).reshape(-1, 3)
+    faces = np.column_stack([np.full(n, 4), np.arange(4 * n).reshape(-1, 4)]).ravel()
+    quads = pv.PolyData(points, faces)
+    quads.cell_arrays['lithology'] = intervals['lithology']
+
+    profile = section['profile'][~np.isnan(section['profile'][:, 1])]
+    surface = pv.PolyData(np.column_stack([profile[:, 0], np.zeros(len(profile)), profile[:, 1]]))
+    surface.lines = np.hstack([len(profile), np.arange(len(profile))]) if len(profile) > 1 else []
+    return pv.MultiBlock({'intervals': quads, 'surface': surface})
@@ -0,0 +1,149 @@
+from collections import namedtuple
+from contextlib import contextmanager
+import threading
+from sqlalchemy.orm import sessionmaker
+from core.core import Project
+from utils.orm import select_intervals
+
+ProjectSnapshot = namedtuple('ProjectSnapshot', ['name', 'version', 'borehole_ids', 'boreholes_3d'])
+ProjectSnapshot.__doc__ = """Immutable state of a project at a given version, shared by concurrent readers
+
+Attributes
+-----------
+name : str
+version : int
+    incremented by each write
+borehole_ids : tuple of str
+boreholes_3d : tuple of Borehole3D objects, that must not be modified by readers
+"""
+
+
+class ProjectService:
+    """
+    Thread-safe access to a project for a multi-user service
+
+    Readers get immutable snapshots of the loaded project or run queries with their own session.
+    All writes go through a single Project object protected by a lock and publish a new snapshot
+    when they are done, so that readers never see a partially updated project.
+
+    Attributes
+    -----------
+    name : str
+    session_factory : sqlalchemy sessionmaker
+        creates one session per request on the connection pool of the engine
+    snapshot : ProjectSnapshot
+        current state of the project
+
+    Methods
+    --------
+    session()
+    select(components=None, depth=None, boreholes=None)
+    refresh()
+    add_borehole(bh)
+    add_components(components)
+    """
+
+    def __init__(self, engine, legend=None, name='new_project'):
+        """
+        ProjectService class
+
+        Parameters
+        -----------
+        engine : sqlalchemy engine
+            engine of the project database, for an in-memory SQLite database use
+            poolclass=StaticPool and connect_args={'check_same_thread': False}
+        legend : Striplog Legend object
+        name : str
+
+        """
+
+        self.name = name
+        self.session_factory = sessionmaker(bind=engine)
+        self._write_lock = threading.Lock()
+        self._writer = Project(self.session_factory(), legend=legend, name=name)
+        self._snapshot = None
+        self._publish()
+        self._writer.session.close()
+
+    @property
+    def snapshot(self):
+        'Returns the current immutable snapshot of the project'
+        return self._snapshot
+
+    def _publish(self):
+        # copy the writer lists into a new snapshot, replacing the reference is atomic for readers
+        version = 0 if self._snapshot is None else self._snapshot.version + 1
+        self._snapshot = ProjectSnapshot(name=self.name, version=version,
+                                         borehole_ids=tuple(bh.id for bh in self._writer.boreholes),
+                                         boreholes_3d=tuple(self._writer.boreholes_3d))
+
+    @contextmanager
+    def session(self):
+        """
+        Context manager providing a new session for a request, closed at exit
+        """
+
+        session = self.session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def select(self, components=None, depth=None, boreholes=None):
+        """
+        Select intervals in the database with a session of the request
+
+        See Also
+        ---------
+        Project.select : description of the parameters
+        """
+
+        with self.session() as session:
+            return select_intervals(session, components=components, depth=depth, boreholes=boreholes)
+
+    def _write(self, write, *args):
+        # single writer path: writes are serialized and publish a new snapshot only when they succeed
+        with self._write_lock:
+            try:
+                write(*args)
+                self._publish()
+            except Exception:
+                # a failed flush or commit leaves the session unusable until it is rolled back
+                self._writer.session.rollback()
+                raise
+            finally:
+                # release the connection, writes may come from another thread (e.g. with SQLite)
+                self._writer.session.close()
+
+    def _reload(self):
+        self._writer.session.expire_all()
+        self._writer.refresh(update_3d=True)
+
+    def refresh(self):
+        """
+        Reloads the project from the database and publishes a new snapshot
+        """
+
+        self._write(self._reload)
+
+    def add_borehole(self, bh):
+        """
+        Add a Borehole to the project and publishes a new snapshot
+
+        See Also
+        ---------
+        Project.add_borehole : description of the parameters
+        """
+
+        self._write(self._writer.add_borehole, bh)
+
+    def add_components(self, components):
+        """
+        Add a dict of Components to the project and publishes a new snapshot
+
+        See Also
+        ---------
+        Project.add_components : description of the parameters
+        """
+
+        self._write(self._writer.add_components, components)
@@ -0,0 +1,273 @@
+import json
+import os
+import numpy as np
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8"/>
+<title>Tiled borehole scene</title>
+<style>html, body, canvas {margin: 0; width: 100%; height: 100%; display: block; background: #ffffff;}</style>
+</head>
+<body>
+<canvas id="view"></canvas>
+<script>
+// Minimal offline WebGL2 viewer: only the tiles in the view frustum are fetched, at a level of detail
+// depending on their distance to the camera. Serve the directory over http (python -m http.server).
+const canvas = document.getElementById('view');
+const gl = canvas.getContext('webgl2');
+const vs = `#version 300 es
+in vec3 position; in vec3 colour; uniform mat4 mvp; out vec3 vColour; out vec3 vPosition;
+void main() { vColour = colour; vPosition = position; gl_Position = mvp * vec4(position, 1.0); }`;
+const fs = `#version 300 es
+precision highp float; in vec3 vColour; in vec3 vPosition; out vec4 fragColour;
+void main() {
+  vec3 n = normalize(cross(dFdx(vPosition), dFdy(vPosition)));
+  float light = 0.4 + 0.6 * abs(dot(n, normalize(vec3(0.3, 0.5, 0.8))));
+  fragColour = vec4(vColour * light, 1.0);
+}`;
+function compile(type, source) {
+  const shader = gl.createShader(type); gl.shaderSource(shader, source); gl.compileShader(shader); return shader;
+}
+const program = gl.createProgram();
+gl.attachShader(program, compile(gl.VERTEX_SHADER, vs));
+gl.attachShader(program, compile(gl.FRAGMENT_SHADER, fs));
+gl.bindAttribLocation(program, 0, 'position');
+gl.bindAttribLocation(program, 1, 'colour');
+gl.linkProgram(program);
+const mvpLocation = gl.getUniformLocation(program, 'mvp');
+
+function multiply(a, b) {
+  const out = new Float32Array(16);
+  for (let i = 0; i < 4; i++) for (let j = 0; j < 4; j++) {
+    let s = 0; for (let k = 0; k < 4; k++) s += a[k * 4 + j] * b[i * 4 + k]; out[i * 4 + j] = s;
+  }
+  return out;
+}
+function perspective(fovy, aspect, near, far) {
+  const f = 1 / Math.tan(fovy / 2), nf = 1 / (near - far);
+  return new Float32Array([f / aspect, 0, 0, 0, 0, f, 0, 0, 0, 0, (far + near) * nf, -1, 0, 0, 2 * far * near * nf, 0]);
+}
+function lookAt(eye, target, up) {
+  let z = eye.map((v, i) => v - target[i]); const zl = Math.hypot(...z); z = z.map(v => v / zl);
+  let x = [up[1] * z[2] - up[2] * z[1], up[2] * z[0] - up[0] * z[2], up[0] * z[1] - up[1] * z[0]];
+  const xl = Math.hypot(...x); x = x.map(v => v / xl);
+  const y = [z[1] * x[2] - z[2] * x[1], z[2] * x[0] - z[0] * x[2], z[0] * x[1] - z[1] * x[0]];
+  const dot = (a, b) => a[0] * b[0] + a[1] * b[1] + a[2] * b[2];
+  return new Float32Array([x[0], y[0], z[0], 0, x[1], y[1], z[1], 0, x[2], y[2], z[2], 0,
+                           -dot(x, eye), -dot(y, eye), -dot(z, eye), 1]);
+}
+function visible(mvp, b) {
+  // a tile is culled only if all the corners of its bounding box are outside the same clip plane
+  const outside = [0, 0, 0, 0, 0, 0];
+  for (const x of [b[0], b[1]]) for (const y of [b[2], b[3]]) for (const z of [b[4], b[5]]) {
+    const c = [0, 1, 2, 3].map(j => mvp[j] * x + mvp[4 + j] * y + mvp[8 + j] * z + mvp[12 + j]);
+    for (let a = 0; a < 3; a++) { if (c[a] < -c[3]) outside[2 * a]++; if (c[a] > c[3]) outside[2 * a + 1]++; }
+  }
+  return outside.every(n => n < 8);
+}
+
+const camera = {yaw: 0.8, pitch: 0.5, distance: 1, target: [0, 0, 0]};
+const loaded = {};
+let manifest = null;
+function load(tile, lod) {
+  const key = tile.id + '/' + lod;
+  if (key in loaded) return loaded[key];
+  loaded[key] = null;
+  fetch(tile.lods[lod].url).then(r => r.arrayBuffer()).then(buffer => {
+    const n = tile.lods[lod].vertices, m = tile.lods[lod].indices, wide = tile.lods[lod].index_type === 'uint32';
+    const vao = gl.createVertexArray(); gl.bindVertexArray(vao);
+    const positions = gl.createBuffer(); gl.bindBuffer(gl.ARRAY_BUFFER, positions);
+    gl.bufferData(gl.ARRAY_BUFFER, new Float32Array(buffer, 0, 3 * n), gl.STATIC_DRAW);
+    gl.enableVertexAttribArray(0); gl.vertexAttribPointer(0, 3, gl.FLOAT, false, 0, 0);
+    const colours = gl.createBuffer(); gl.bindBuffer(gl.ARRAY_BUFFER, colours);
+    gl.bufferData(gl.ARRAY_BUFFER, new Uint8Array(buffer, 12 * n, 3 * n), gl.STATIC_DRAW);
+    gl.enableVertexAttribArray(1); gl.vertexAttribPointer(1, 3, gl.UNSIGNED_BYTE, true, 0, 0);
+    const indices = gl.createBuffer(); gl.bindBuffer(gl.ELEMENT_ARRAY_BUFFER, indices);
+    const offset = tile.lods[lod].indices_offset;
+    gl.bufferData(gl.ELEMENT_ARRAY_BUFFER, wide ? new Uint32Array(buffer, offset, m) : new Uint16Array(buffer, offset, m),
+                  gl.STATIC_DRAW);
+    gl.bindVertexArray(null);
+    loaded[key] = {vao: vao, count: m, type: wide ? gl.UNSIGNED_INT : gl.UNSIGNED_SHORT};
+    draw();
+  });
+  return null;
+}
+function draw() {
+  canvas.width = canvas.clientWidth; canvas.height = canvas.clientHeight;
+  gl.viewport(0, 0, canvas.width, canvas.height);
+  gl.clearColor(1, 1, 1, 1); gl.clear(gl.COLOR_BUFFER_BIT | gl.DEPTH_BUFFER_BIT); gl.enable(gl.DEPTH_TEST);
+  if (manifest === null) return;
+  const t = camera.target, d = camera.distance;
+  const eye = [t[0] + d * Math.cos(camera.pitch) * Math.cos(camera.yaw),
+               t[1] + d * Math.cos(camera.pitch) * Math.sin(camera.yaw), t[2] + d * Math.sin(camera.pitch)];
+  const mvp = multiply(perspective(0.8, canvas.width / canvas.height, d / 1000, d * 10), lookAt(eye, t, [0, 0, 1]));
+  gl.useProgram(program); gl.uniformMatrix4fv(mvpLocation, false, mvp);
+  for (const tile of manifest.tiles) {
+    if (!visible(mvp, tile.bounds)) continue;
+    const b = tile.bounds, c = [(b[0] + b[1]) / 2, (b[2] + b[3]) / 2, (b[4] + b[5]) / 2];
+    const distance = Math.hypot(c[0] - eye[0], c[1] - eye[1], c[2] - eye[2]);
+    const lod = Math.min(tile.lods.length - 1, Math.floor(distance / (2 * manifest.tile_size)));
+    // draw a coarser level already loaded while the requested one is fetched
+    let mesh = load(tile, lod);
+    for (let l = tile.lods.length - 1; mesh === null && l >= 0; l--) mesh = loaded[tile.id + '/' + l] || null;
+    if (mesh !== null) { gl.bindVertexArray(mesh.vao); gl.drawElements(gl.TRIANGLES, mesh.count, mesh.type, 0); }
+  }
+}
+let drag = null;
+canvas.addEventListener('mousedown', e => { drag = [e.clientX, e.clientY]; });
+window.addEventListener('mouseup', () => { drag = null; });
+window.addEventListener('mousemove', e => {
+  if (drag === null) return;
+  camera.yaw -= (e.clientX - drag[0]) * 0.01;
+  camera.pitch = Math.max(-1.5, Math.min(1.5, camera.pitch + (e.clientY - drag[1]) * 0.01));
+  drag = [e.clientX, e.clientY]; draw();
+});
+canvas.addEventListener('wheel', e => { e.preventDefault(); camera.distance *= Math.exp(e.deltaY * 0.001); draw(); });
+window.addEventListener('resize', draw);
+fetch('manifest.json').then(r => r.json()).then(m => {
+  manifest = m;
+  const b = m.bounds;
+  camera.target = [(b[0] + b[1]) / 2, (b[2] + b[3]) / 2, (b[4] + b[5]) / 2];
+  camera.distance = 1.5 * Math.max(b[1] - b[0], b[3] - b[2], b[5] - b[4], m.tile_size);
+  draw();
+});
+</script>
+</body>
+</html>
+"""
+
+
+def tube_to_buffers(borehole, origin, radius=3, n_sides=20):
+    """
+    Returns indexed triangles of the tube of a borehole as compact arrays
+
+    Parameters
+    -----------
+    borehole : Borehole3D object
+
+    origin : numpy array
+        coordinates subtracted from the vertices so that they fit in float32
+
+    radius : float
+        radius of the tube (default=3)
+
+    n_sides : int
+        number of sides of the tube (default=20)
+
+    Returns
+    --------
+    positions : numpy array
+        float32 array of shape (n, 3) of the vertices
+
+    colours : numpy array
+        uint8 RGB array of shape (n, 3), one colour per vertex from the legend of the borehole
+
+    triangles : numpy array
+        array of shape (m, 3) of vertex indices
+    """
+
+    tube = borehole.get_tube(radius=radius, n_sides=n_sides).triangulate()
+    triangles = tube.faces.reshape(-1, 4)[:, 1:]
+
+    # colour 0 of the colormap is the grey of intervals missing from the legend (index -1)
+    cmap_colours = np.round(np.asarray(borehole.omf_cmap.colors)[:, :3] * 255).astype(np.uint8)
+    codes = np.asarray(tube.cell_arrays['lithology']).astype(int) + 1
+    # points shared by intervals of different colours are duplicated, the others are indexed once
+    n_codes = len(cmap_colours)
+    keys, triangles = np.unique(triangles.ravel() * n_codes + np.repeat(codes, 3), return_inverse=True)
+    positions = (tube.points[keys // n_codes] - origin).astype(np.float32)
+    return positions, cmap_colours[keys % n_codes], triangles.reshape(-1, 3)
+
+
+def get_borehole_location(borehole):
+    """
+    Returns the mean horizontal coordinates of the vertices of a borehole
+    """
+
+    return np.asarray(borehole.geometry.geometry.vertices.array)[:, :2].mean(axis=0)
+
+
+def export_tiles(boreholes_3d, directory, tile_size=100., lods=(20, 8, 3), radius=3, origin=None):
+    """
+    Exports boreholes as spatial tiles of binary meshes at several levels of detail, with a manifest
+    and a local viewer page that fetches only the visible tiles
+
+    Parameters
+    -----------
+    boreholes_3d : list
+        list of Borehole3D objects
+
+    directory : str
+        output directory, created if it does not exist
+
+    tile_size : float
+        size of the square tiles in the horizontal plane (default=100.)
+
+    lods : tuple
+        number of sides of the tubes for each level of detail, from finest to coarsest (default=(20, 8, 3))
+
+    radius : float
+        radius of the tubes (default=3)
+
+    origin : tuple
+        (x, y, z) origin of the tiles coordinates, defaults to the lowest corner of the boreholes
+
+    Returns
+    --------
+    manifest : dict
+        content of the manifest.json file
+    """
+
+    os.makedirs(os.path.join(directory, 'tiles'), exist_ok=True)
+    locations = np.array([get_borehole_location(bh) for bh in boreholes_3d]).reshape(-1, 2)
+    if origin is None:
+        z_min = min([np.asarray(bh.geometry.geometry.vertices.array)[:, 2].min() for bh in boreholes_3d],
+                    default=0.)
+        origin = np.hstack([locations.min(axis=0), z_min]) if len(locations) > 0 else np.zeros(3)
+    origin = np.asarray(origin, dtype=float)
+
+    tile_indices = np.floor((locations - origin[:2]) / tile_size).astype(int)
+    tiles = {}
+    for bh, (ix, iy) in zip(boreholes_3d, tile_indices):
+        tiles.setdefault((ix, iy), []).append(bh)
+
+    manifest = {'origin': origin.tolist(), 'tile_size': tile_size, 'lods': list(lods), 'tiles': []}
+    all_bounds = []
+    for (ix, iy), boreholes in sorted(tiles.items()):
+        tile = {'id': f'{ix:d}_{iy:d}', 'boreholes': [bh.name for bh in boreholes], 'lods': []}
+        for lod, n_sides in enumerate(lods):
+            buffers = [tube_to_buffers(bh, origin, radius=radius, n_sides=n_sides) for bh in boreholes]
+            offsets = np.cumsum([0] + [len(b[0]) for b in buffers])
+            positions = np.vstack([b[0] for b in buffers])
+            colours = np.vstack([b[1] for b in buffers])
+            index_type = 'uint16' if len(positions) <= 2 ** 16 else 'uint32'
+            triangles = np.vstack([b[2] + o for b, o in zip(buffers, offsets)]).astype(index_type)
+            url = f'tiles/{ix:d}_{iy:d}_lod{lod:d}.bin'
+            # positions, colours and indices, the indices start on a multiple of 4 bytes for the typed array
+            indices_offset = -(-(positions.nbytes + colours.nbytes) // 4) * 4
+            with open(os.path.join(directory, url), 'wb') as f:
+                f.write(positions.tobytes())
+                f.write(colours.tobytes())
+                f.write(bytes(indices_offset - positions.nbytes - colours.nbytes))
+                f.write(triangles.tobytes())
+            tile['lods'].append({'url': url, 'vertices': len(positions), 'indices': triangles.size,
+                                 'index_type': index_type, 'indices_offset': indices_offset})
+            if lod == 0:
+                bounds = np.ravel([positions.min(axis=0), positions.max(axis=0)], order='F')
+                tile['bounds'] = bounds.tolist()
+                all_bounds.append(bounds)
+        manifest['tiles'].append(tile)
+
+    if len(all_bounds) > 0:
+        all_bounds = np.array(all_bounds)
+        manifest['bounds'] = np.ravel([all_bounds[:, 0::2].min(axis=0), all_bounds[:, 1::2].max(axis=0)],
+                                      order='F').tolist()
+    else:
+        manifest['bounds'] = [0.] * 6
+
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    with open(os.path.join(directory, 'index.html'), 'w') as f:
+        f.write(VIEWER_HTML)
+    return manifest
@@ -1,5 +1,6 @@
+import os
 import re
-from striplog import Striplog, Lexicon
+import numpy as np
 from core.orm import BoreholeOrm, PositionOrm
 
 
@@ -19,6 +20,8 @@ def striplog_from_text(filename, lexicon=None):
  
     """
 
+    from striplog import Striplog, Lexicon
+
     if lexicon is None:
         lexicon = Lexicon.default()
 
@@ -84,18 +87,139 @@ def boreholes_from_files(borehole_dict=None):
                     comp_id += 1
 
             d = {}
+            base = None
             for interval in strip:
-                top = PositionOrm(id=pos_id, upper=interval.top.upper, middle=interval.top.middle,
-                                  lower=interval.top.lower)
-                base = PositionOrm(id=pos_id + 1, upper=interval.base.upper, middle=interval.base.middle,
+                # the base of the previous interval is shared as top when both are at the same depth
+                if base is not None and (base.upper, base.middle, base.lower) == \
+                        (interval.top.upper, interval.top.middle, interval.top.lower):
+                    top = base
+                else:
+                    top = PositionOrm(id=pos_id, upper=interval.top.upper, middle=interval.top.middle,
+                                      lower=interval.top.lower)
+                    pos_id += 1
+                base = PositionOrm(id=pos_id, upper=interval.base.upper, middle=interval.base.middle,
                                    lower=interval.base.lower)
+                pos_id += 1
                 d.update({int_id: {'description': interval.description, 'interval_number': interval_number, 'top': top,
                                    'base': base}})
                 interval_number += 1
                 int_id += 1
-                pos_id += 2
             boreholes[bh_id].intervals_values = d
             bh_id += 1
         components = {v: k for k, v in component_dict.items()}
 
     return boreholes, components
+
+
+def smallest_uint_dtype(max_value):
+    """returns the smallest unsigned integer dtype able to store values up to max_value"""
+
+    for dtype in [np.uint8, np.uint16, np.uint32]:
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def smallest_int_dtype(min_value, max_value):
+    """returns the smallest signed integer dtype able to store values from min_value to max_value"""
+
+    for dtype in [np.int8, np.int16, np.int32, np.int64]:
+        if np.iinfo(dtype).min <= min_value and max_value <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError(f'values from {min_value} to {max_value} do not fit in 64-bit integers')
+
+
+def save_geometry_npz(boreholes_3d, filename, origin=None, precision=None):
+    """Saves the geometry of Borehole3D objects in a compressed and compact npz file
+
+    Parameters
+    ----------
+    boreholes_3d: list
+                  list of Borehole3D objects
+    filename: str
+              name of the npz file
+    origin: tuple
+            (x, y, z) site origin subtracted from the vertices
+            (default=None, the lowest corner of the vertices rounded down to the meter)
+    precision: float
+               if given, vertices are stored as integers quantized with this step in meters,
+               otherwise as float32 (default=None)
+
+    Returns
+    -------
+    size: int
+          size of the npz file in bytes
+    """
+
+    names, vertices, segments, components = [], [], [], []
+    for bh in boreholes_3d:
+        names.append(bh.name)
+        vertices.append(np.asarray(bh.geometry.geometry.vertices.array, dtype=float).reshape(-1, 3))
+        segments.append(np.asarray(bh.geometry.geometry.segments.array).reshape(-1, 2))
+        components.append(np.asarray(bh.geometry.data[0].array.array).ravel())
+    vertex_offsets = np.cumsum([0] + [len(v) for v in vertices])
+    segment_offsets = np.cumsum([0] + [len(s) for s in segments])
+    vertices = np.vstack(vertices) if len(vertices) > 0 else np.zeros((0, 3))
+    segments = np.vstack(segments) if len(segments) > 0 else np.zeros((0, 2), dtype=int)
+    components = np.hstack(components) if len(components) > 0 else np.zeros(0, dtype=int)
+
+    if origin is None:
+        origin = np.floor(vertices.min(axis=0)) if len(vertices) > 0 else np.zeros(3)
+    origin = np.asarray(origin, dtype=float)
+    relative = vertices - origin
+    if precision is None:
+        encoded = relative.astype(np.float32)
+    else:
+        scaled = np.round(relative / precision)
+        if len(scaled) > 0 and np.abs(scaled).max() >= 2 ** 63:
+            raise ValueError(f'precision {precision:g} is too fine for coordinates relative to origin {origin}')
+        quantized = scaled.astype(np.int64)
+        if len(quantized) == 0:
+            encoded = quantized.astype(np.uint8)
+        elif quantized.min() >= 0:
+            encoded = quantized.astype(smallest_uint_dtype(quantized.max()))
+        else:
+            encoded = quantized.astype(smallest_int_dtype(quantized.min(), quantized.max()))
+
+    # component indices are positions in the borehole's own components list, -1 when the main component
+    # of the interval is not in it, they are shifted by one to be stored unsigned
+    np.savez_compressed(filename, names=np.array(names, dtype=str), origin=origin,
+                        precision=np.array(np.nan if precision is None else precision),
+                        vertices=encoded, vertex_offsets=vertex_offsets, segment_offsets=segment_offsets,
+                        segments=segments.astype(smallest_uint_dtype(segments.max() if len(segments) > 0 else 0)),
+                        components=(components + 1).astype(smallest_uint_dtype(components.max() + 1
+                                                                                if len(components) > 0 else 0)))
+    return os.path.getsize(filename if filename.endswith('.npz') else filename + '.npz')
+
+
+def load_geometry_npz(filename):
+    """Loads the geometry of boreholes saved with save_geometry_npz
+
+    Parameters
+    ----------
+    filename: str
+              name of the npz file
+
+    Returns
+    -------
+    geometries: list
+                list of (name, vertices, segments, components) tuples in the order of the saved boreholes,
+                vertices are given in absolute float64 coordinates
+    """
+
+    with np.load(filename) as npz:
+        vertices = npz['vertices'].astype(float)
+        precision = float(npz['precision'])
+        if not np.isnan(precision):
+            vertices *= precision
+        vertices += npz['origin']
+        segments = npz['segments'].astype(int)
+        components = npz['components'].astype(int) - 1
+        vertex_offsets, segment_offsets = npz['vertex_offsets'], npz['segment_offsets']
+        # a list rather than a dict keyed by name, so that boreholes with the same name are all kept
+        geometries = []
+        for k, name in enumerate(npz['names']):
+            geometries.append((str(name), vertices[vertex_offsets[k]:vertex_offsets[k + 1]],
+                               segments[segment_offsets[k]:segment_offsets[k + 1]],
+                               components[segment_offsets[k]:segment_offsets[k + 1]]))
+    return geometries
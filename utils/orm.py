@@ -1,4 +1,7 @@
-from striplog import Position, Component, Interval
+from sqlalchemy import false, or_
+from sqlalchemy.orm import aliased
+import numpy as np
+from core.orm import BoreholeOrm, IntervalOrm, PositionOrm
 
 
 def get_interval_list(bh):
@@ -16,10 +19,172 @@ def get_interval_list(bh):
                    list of Interval objects
                    
     """
+    from striplog import Position, Component, Interval
+
     interval_list = []
-    for i in bh.intervals.values():
-        top = Position(upper=i.top.upper, middle=i.top.middle, lower=i.top.lower, x=i.top.x, y=i.top.y)
-        base = Position(upper=i.base.upper, middle=i.base.middle, lower=i.base.lower, x=i.top.x, y=i.top.y)
+    # Position objects by PositionOrm object identity, which also holds for boreholes not yet flushed
+    contacts = {}
+    for i in sorted(bh.intervals.values(), key=lambda interval: interval.interval_number):
+        for pos in (i.top, i.base):
+            if id(pos) not in contacts:
+                contacts[id(pos)] = Position(upper=pos.upper, middle=pos.middle, lower=pos.lower, x=pos.x, y=pos.y)
         comp = Component.from_text(i.description)
-        interval_list.append(Interval(top=top, base=base, description=i.description, components=[comp]))
+        interval_list.append(Interval(top=contacts[id(i.top)], base=contacts[id(i.base)],
+                                      description=i.description, components=[comp]))
     return interval_list
+
+
+def escape_like(text):
+    """escapes the wildcards of a LIKE pattern, with backslash as escape character"""
+
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def select_intervals(session, components=None, depth=None, boreholes=None):
+    """select intervals matching components, depth range and boreholes in a single SQL query
+
+    Parameters
+    ----------
+    session: ORM session object
+    components: list
+                list of component names, an interval matches if its description contains one of them
+                (case insensitive, default=None for all components)
+    depth: tuple
+           (top, base) depth range, intervals overlapping the range are selected and clipped to it
+           (default=None for all depths)
+    boreholes: list
+               list of borehole ids (default=None for all boreholes)
+
+    Returns
+    -------
+    selection: dict
+               dictionary of numpy arrays with keys 'borehole', 'interval_number', 'description',
+               'top', 'base', 'x', 'y', 'top_id' and 'base_id', one item per selected interval,
+               ordered by borehole and interval number
+    """
+
+    top_pos = aliased(PositionOrm)
+    base_pos = aliased(PositionOrm)
+    query = session.query(IntervalOrm.borehole, IntervalOrm.interval_number, IntervalOrm.description,
+                          top_pos.middle, base_pos.middle, top_pos.x, top_pos.y, IntervalOrm.top_id,
+                          IntervalOrm.base_id) \
+        .join(top_pos, IntervalOrm.top_id == top_pos.id) \
+        .join(base_pos, IntervalOrm.base_id == base_pos.id)
+
+    if boreholes is not None:
+        query = query.filter(IntervalOrm.borehole.in_(list(boreholes)))
+    if components is not None:
+        components = list(components)
+        if len(components) == 0:
+            # or_() without clauses renders as no filter at all
+            query = query.filter(false())
+        else:
+            query = query.filter(or_(*[IntervalOrm.description.ilike('%' + escape_like(c) + '%', escape='\\')
+                                       for c in components]))
+    if depth is not None:
+        query = query.filter(top_pos.middle < depth[1], base_pos.middle > depth[0])
+    rows = query.order_by(IntervalOrm.borehole, IntervalOrm.interval_number).all()
+
+    keys = ['borehole', 'interval_number', 'description', 'top', 'base', 'x', 'y', 'top_id', 'base_id']
+    columns = list(zip(*rows)) if len(rows) > 0 else [[]] * len(keys)
+    selection = {'borehole': np.array(columns[0], dtype=str),
+                 'interval_number': np.array(columns[1], dtype=int),
+                 'description': np.array(columns[2], dtype=str),
+                 'top': np.array(columns[3], dtype=float),
+                 'base': np.array(columns[4], dtype=float),
+                 'x': np.array(columns[5], dtype=float),
+                 'y': np.array(columns[6], dtype=float),
+                 'top_id': np.array(columns[7], dtype=int),
+                 'base_id': np.array(columns[8], dtype=int)}
+    if depth is not None:
+        selection['top'] = np.clip(selection['top'], depth[0], depth[1])
+        selection['base'] = np.clip(selection['base'], depth[0], depth[1])
+    return selection
+
+
+def get_selection_interval_list(selection):
+    """create lists of interval from a selection, grouped by borehole
+
+    Parameters
+    ----------
+    selection: dict
+               dictionary of numpy arrays as returned by select_intervals
+
+    Returns
+    -------
+    interval_lists: dict
+                    dictionary of lists of Interval objects with borehole ids as keys
+    """
+
+    from striplog import Position, Component, Interval
+
+    interval_lists = {}
+    for k in range(len(selection['borehole'])):
+        x, y = selection['x'][k], selection['y'][k]
+        top = Position(middle=selection['top'][k], x=x, y=y)
+        base = Position(middle=selection['base'][k], x=x, y=y)
+        description = selection['description'][k]
+        comp = Component.from_text(description)
+        interval_lists.setdefault(selection['borehole'][k], []).append(
+            Interval(top=top, base=base, description=description, components=[comp]))
+    return interval_lists
+
+
+def select_boreholes_in_box(session, x_min, x_max, y_min, y_max):
+    """select ids of boreholes with intervals located in a horizontal bounding box
+
+    Parameters
+    ----------
+    session: ORM session object
+    x_min, x_max, y_min, y_max: float
+                                bounds of the box
+
+    Returns
+    -------
+    borehole_ids: list
+                  list of borehole ids
+    """
+
+    query = session.query(IntervalOrm.borehole).distinct() \
+        .join(PositionOrm, IntervalOrm.top_id == PositionOrm.id) \
+        .filter(PositionOrm.x.between(x_min, x_max), PositionOrm.y.between(y_min, y_max))
+    return [row[0] for row in query.all()]
+
+
+def migrate_shared_positions(session):
+    """make consecutive intervals of each borehole share their contact position and delete the duplicates
+
+    Databases created before positions were shared store two positions per interval. This migration is
+    idempotent and does not change the schema.
+
+    Parameters
+    ----------
+    session: ORM session object
+
+    Returns
+    -------
+    n_removed: int
+               number of deleted positions
+    """
+
+    duplicates = []
+    for bh in session.query(BoreholeOrm).all():
+        intervals = sorted(bh.intervals.values(), key=lambda interval: interval.interval_number)
+        for previous, current in zip(intervals[:-1], intervals[1:]):
+            base, top = previous.base, current.top
+            if base is not None and top is not None and base is not top and \
+                    (base.upper, base.middle, base.lower, base.x, base.y) == (top.upper, top.middle, top.lower,
+                                                                              top.x, top.y):
+                current.top = base
+                duplicates.append(top)
+    session.flush()
+
+    n_removed = 0
+    for pos in duplicates:
+        referenced = session.query(IntervalOrm.id).filter(
+            or_(IntervalOrm.top_id == pos.id, IntervalOrm.base_id == pos.id)).first()
+        if referenced is None:
+            session.delete(pos)
+            n_removed += 1
+    session.commit()
+    return n_removed